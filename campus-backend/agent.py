@@ -53,6 +53,7 @@ Your purpose is to assist a campus admin with:
    - Use `get_total_students` for total student count.  
    - Use `get_recent_onboarded` for last onboarded students.  
    - Use `get_active_students` when asked about active students in the last N days.  
+   - Use `send_email` for one student, `send_to_many` for a list of students and `send_to_department` for a whole department. These only queue the emails: tell the user the job id, and use `get_notification_status` when asked whether it was delivered.  
 
 7. **When the user asks about the Saylani Institute (admissions, courses, rules, facilities, or institute-related questions), ALWAYS use the `faq_rag_tool` to retrieve information from the stored PDF knowledge base.**
 
@@ -69,6 +70,9 @@ Your purpose is to assist a campus admin with:
         get_last_added_students,
         get_active_students,
         send_email,
+        send_to_department,
+        send_to_many,
+        get_notification_status,
         faq_rag_tool,
     ],
     model=OpenAIChatCompletionsModel(model="gemini-2.0-flash", openai_client=client),
@@ -6,6 +6,28 @@ load_dotenv()  # loads .env
 
 class Settings:
     DATABASE_URL: str = os.getenv("SUPABASE_URL")
+    # Comma-separated read replica URLs; empty -> reads go to DATABASE_URL
+    DATABASE_READ_URLS: list = [u.strip() for u in os.getenv("DATABASE_READ_URLS", "").split(",") if u.strip()]
+    DB_QUERY_CACHE_SIZE: int = int(os.getenv("DB_QUERY_CACHE_SIZE", "1000"))
+
+    # --- HTTP response cache (ETag + compression) ---
+    HTTP_COMPRESS_MIN_BYTES: int = int(os.getenv("HTTP_COMPRESS_MIN_BYTES", "1024"))
+    HTTP_CACHE_MAX_ENTRIES: int = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "256"))
+
+    # --- Notifications (SMTP + job queue) ---
+    SMTP_HOST: str = os.getenv("SMTP_HOST")  # unset -> mock sends (print only)
+    SMTP_PORT: int = int(os.getenv("SMTP_PORT", "587"))
+    SMTP_USER: str = os.getenv("SMTP_USER")
+    SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD")
+    SMTP_STARTTLS: bool = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+    SMTP_FROM: str = os.getenv("SMTP_FROM", "no-reply@campus.local")
+    SMTP_POOL_SIZE: int = int(os.getenv("SMTP_POOL_SIZE", "2"))
+    NOTIFY_BACKEND: str = os.getenv("NOTIFY_BACKEND", "memory")  # "memory" or "sqlite"
+    NOTIFY_SQLITE_PATH: str = os.getenv("NOTIFY_SQLITE_PATH", "notifications.db")
+    NOTIFY_MEMORY_MAX_FINISHED: int = int(os.getenv("NOTIFY_MEMORY_MAX_FINISHED", "1000"))  # memory backend only
+    NOTIFY_WORKERS: int = int(os.getenv("NOTIFY_WORKERS", "2"))
+    NOTIFY_BATCH_SIZE: int = int(os.getenv("NOTIFY_BATCH_SIZE", "50"))
+    NOTIFY_MAX_RETRIES: int = int(os.getenv("NOTIFY_MAX_RETRIES", "3"))
 
 settings = Settings()
 
@@ -1,25 +1,148 @@
 # database.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
 from config import settings
-import os 
+import os
 from dotenv import load_dotenv
 load_dotenv()
 
 DATABASE_URL = os.getenv('SUPABASE_URL')
-# ✅ Create engine from DATABASE_URL (Supabase Postgres URL)
-engine = create_engine(settings.DATABASE_URL, future=True)
 
-# ✅ DB session
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+def _make_engine(url: str):
+    # query_cache_size = SQLAlchemy's compiled-statement cache (SQL string is compiled once per query shape)
+    return create_engine(url, future=True, query_cache_size=settings.DB_QUERY_CACHE_SIZE)
+
+
+# ✅ Writer engine (Supabase Postgres URL) + optional read replicas
+engine = _make_engine(settings.DATABASE_URL)
+read_engines = [_make_engine(url) for url in settings.DATABASE_READ_URLS] or [engine]
+_read_cycle = itertools.cycle(read_engines)
+_read_cycle_lock = threading.Lock()
+
+
+# Per-request routing state, set by the middleware in main.py:
+#   use_writer   -> a session in this request committed a write (or the caller asked for
+#                   fresh data), so later reads in the same request skip the replicas
+#   used_replica -> at least one read in this request was served by a replica
+current_request_routing: ContextVar = ContextVar("current_request_routing", default=None)
+
+
+def new_request_routing() -> dict:
+    return {"use_writer": False, "used_replica": False}
+
+
+# ✅ Session that sends reads to a replica until it (or its request) writes, then sticks to the writer
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, **kw):
+        routing = current_request_routing.get()
+        if (self.info.get("read_only") and not self.info.get("wrote") and not self._flushing
+                and not (routing and routing["use_writer"])):
+            if "reader" not in self.info:
+                with _read_cycle_lock:
+                    self.info["reader"] = next(_read_cycle)
+            if routing is not None and self.info["reader"] is not engine:
+                routing["used_replica"] = True
+            return self.info["reader"]
+        return engine
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_wrote(session, flush_context):
+    # Read-your-writes: everything after a write in this session goes to the writer
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _mark_request_wrote(session):
+    # ...and so does every later session in the same request (e.g. agent tools, which each open their own)
+    routing = current_request_routing.get()
+    if session.info.get("wrote") and routing is not None:
+        routing["use_writer"] = True
+
+
+# ✅ DB sessions: SessionLocal always uses the writer, ReadSessionLocal prefers replicas
+SessionLocal = sessionmaker(bind=engine, class_=RoutingSession, autoflush=False, autocommit=False)
+ReadSessionLocal = sessionmaker(class_=RoutingSession, autoflush=False, autocommit=False,
+                                info={"read_only": True})
 
 # ✅ Base class for models
 Base = declarative_base()
 
-# ✅ Dependency for FastAPI routes
+
+# ============================
+#   QUERY LATENCY (per route)
+# ============================
+
+# Set per request by the middleware in main.py; engine events add each query's time to it
+current_query_stats: ContextVar = ContextVar("current_query_stats", default=None)
+_route_stats = {}
+_route_stats_lock = threading.Lock()
+
+
+def _track_engine(eng, role: str):
+    # Start time lives on the execution context, so a statement that raises leaves nothing behind
+    @event.listens_for(eng, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start = time.perf_counter()
+
+    @event.listens_for(eng, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_query_start", None)
+        if start is None:
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats["queries"] += 1
+            stats["db_ms"] += elapsed_ms
+            stats[role] += 1
+
+
+_track_engine(engine, "writer")
+for _eng in read_engines:
+    if _eng is not engine:
+        _track_engine(_eng, "reader")
+
+
+def new_query_stats() -> dict:
+    return {"queries": 0, "db_ms": 0.0, "writer": 0, "reader": 0}
+
+
+def record_route_stats(route: str, stats: dict):
+    with _route_stats_lock:
+        agg = _route_stats.setdefault(route, {"requests": 0, **new_query_stats()})
+        agg["requests"] += 1
+        for key in ("queries", "db_ms", "writer", "reader"):
+            agg[key] += stats[key]
+
+
+def get_route_stats() -> dict:
+    with _route_stats_lock:
+        return {
+            route: {**agg, "avg_db_ms": round(agg["db_ms"] / agg["requests"], 3), "db_ms": round(agg["db_ms"], 3)}
+            for route, agg in _route_stats.items()
+        }
+
+
+# ✅ Dependencies for FastAPI routes
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,265 @@
+# http_cache.py
+"""
+Response layer for the dashboard's polled GET routes (/students, /analytics/*).
+
+- JSON is serialized with orjson (FastJSONResponse is the app's default response class)
+- each table has an in-process version counter, bumped when a session commits
+  a write to it; ETags are derived from the versions a route reads, a random
+  per-process nonce (so tags from a previous run never match) and, for routes
+  that depend on the clock, a time bucket
+- If-None-Match hits return 304 before the route (and the DB) is touched
+- bodies over HTTP_COMPRESS_MIN_BYTES are brotli/gzip encoded per Accept-Encoding
+  (q-values respected), and the encoded bytes are cached per ETag so repeat
+  polls skip re-serializing
+- cache misses read from the writer, never a replica: a lagging replica could
+  return data older than the version in the ETag, and a 304 would then pin that
+  stale body in the browser until the next write. Polls that hit the ETag or
+  the body cache don't touch any database.
+
+Version counters live in this process, so ETags are only valid for a single
+worker and don't see writes made outside the app; run multiple workers behind
+a shared counter before scaling out.
+"""
+import gzip
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import orjson
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import event
+
+from config import settings
+from database import RoutingSession, current_request_routing, new_request_routing
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+# Polled GET routes -> tables whose writes change their response
+CACHED_ROUTES = {
+    "/students": ("students",),
+    "/analytics/total": ("students",),
+    "/analytics/recent": ("students",),
+    "/analytics/by-department": ("students",),
+    "/analytics/active": ("students", "activity_logs"),
+}
+
+# Routes whose response also changes with the clock -> ETag bucket size in seconds
+ROUTE_TIME_BUCKETS = {
+    "/analytics/active": 3600,  # "active in the last N days" shifts as time passes
+}
+
+_PROCESS_NONCE = uuid.uuid4().hex
+
+
+# ============================
+#   TABLE VERSIONS
+# ============================
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def get_table_version(table: str) -> int:
+    with _versions_lock:
+        return _versions.get(table, 0)
+
+
+def bump_table_versions(tables):
+    with _versions_lock:
+        for table in tables:
+            _versions[table] = _versions.get(table, 0) + 1
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _collect_written_tables(session, flush_context):
+    written = session.info.setdefault("written_tables", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table:
+            written.add(table)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _bump_on_commit(session):
+    # Only committed writes invalidate ETags; rolled back ones are dropped below
+    written = session.info.pop("written_tables", None)
+    if written:
+        bump_table_versions(written)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("written_tables", None)
+
+
+# ============================
+#   ETAG + COMPRESSION MIDDLEWARE
+# ============================
+
+_body_cache = OrderedDict()  # (etag, encoding) -> (body, headers, raw size)
+_body_cache_lock = threading.Lock()
+_route_stats = {}
+_route_stats_lock = threading.Lock()
+
+
+def _time_bucket(seconds: int) -> int:
+    return int(time.time() // seconds)
+
+
+def _etag(path: str, query: str, tables) -> str:
+    versions = ",".join(f"{t}={get_table_version(t)}" for t in tables)
+    bucket = _time_bucket(ROUTE_TIME_BUCKETS[path]) if path in ROUTE_TIME_BUCKETS else ""
+    key = f"{_PROCESS_NONCE}|{path}?{query}|{versions}|{bucket}"
+    digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _parse_accept_encoding(accept_encoding: str) -> dict:
+    """Map each coding in an Accept-Encoding header to its q-value (1.0 when absent)."""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    return weights
+
+
+def _choose_encoding(accept_encoding: str):
+    weights = _parse_accept_encoding(accept_encoding)
+    available = ("br", "gzip") if brotli is not None else ("gzip",)  # ties go to br
+
+    def weight(coding):
+        return weights.get(coding, weights.get("*", 0.0))
+
+    best = max(available, key=weight)
+    if weight(best) <= 0:
+        return None
+    if "identity" in weights and weights["identity"] > weight(best):
+        return None
+    return best
+
+
+def _compress(body: bytes, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def _cache_get(key):
+    with _body_cache_lock:
+        hit = _body_cache.get(key)
+        if hit:
+            _body_cache.move_to_end(key)
+        return hit
+
+
+def _cache_put(key, value):
+    with _body_cache_lock:
+        _body_cache[key] = value
+        _body_cache.move_to_end(key)
+        while len(_body_cache) > settings.HTTP_CACHE_MAX_ENTRIES:
+            _body_cache.popitem(last=False)
+
+
+def _record(path: str, status: str, raw_bytes: int, wire_bytes: int, cpu_ms: float):
+    with _route_stats_lock:
+        s = _route_stats.setdefault(path, {
+            "requests": 0, "not_modified": 0, "cache_hits": 0, "raw_bytes": 0, "wire_bytes": 0, "cpu_ms": 0.0,
+        })
+        s["requests"] += 1
+        if status in ("not_modified", "cache_hits"):
+            s[status] += 1
+        s["raw_bytes"] += raw_bytes
+        s["wire_bytes"] += wire_bytes
+        s["cpu_ms"] += cpu_ms
+
+
+def get_http_stats() -> dict:
+    with _route_stats_lock:
+        return {
+            path: {
+                **s,
+                "cpu_ms": round(s["cpu_ms"], 3),
+                "avg_wire_bytes": round(s["wire_bytes"] / s["requests"]),
+                "avg_cpu_ms": round(s["cpu_ms"] / s["requests"], 3),
+            }
+            for path, s in _route_stats.items()
+        }
+
+
+async def conditional_cache(request: Request, call_next):
+    """HTTP middleware: ETag/304, compression and body caching for CACHED_ROUTES."""
+    path = request.url.path
+    tables = CACHED_ROUTES.get(path)
+    if request.method != "GET" or tables is None:
+        return await call_next(request)
+
+    # process_time covers all threads, so concurrent requests blur this per-poll CPU figure
+    cpu_start = time.process_time()
+    etag = _etag(path, request.url.query, tables)
+    base_headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+    if etag in request.headers.get("if-none-match", ""):
+        _record(path, "not_modified", 0, 0, (time.process_time() - cpu_start) * 1000)
+        return Response(status_code=304, headers=base_headers)
+
+    encoding = _choose_encoding(request.headers.get("accept-encoding", ""))
+    cached = _cache_get((etag, encoding))
+    if cached:
+        body, headers, raw_size = cached
+        _record(path, "cache_hits", raw_size, len(body), (time.process_time() - cpu_start) * 1000)
+        return Response(content=body, headers=headers)
+
+    routing = current_request_routing.get()
+    if routing is None:
+        routing = new_request_routing()
+        current_request_routing.set(routing)
+    # The body must be at least as new as the versions in the ETag; replicas may lag
+    routing["use_writer"] = True
+
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+    if routing["used_replica"]:
+        # Something read past the routing anyway: send the body, but nothing a client could revalidate
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    raw = b"".join([chunk async for chunk in response.body_iterator])
+    headers = {
+        k: v for k, v in response.headers.items()
+        if k not in ("content-length", "content-encoding")
+    }
+    headers.update(base_headers)
+    body = raw
+    if encoding and len(raw) >= settings.HTTP_COMPRESS_MIN_BYTES:
+        body = _compress(raw, encoding)
+        headers["Content-Encoding"] = encoding
+
+    _cache_put((etag, encoding), (body, headers, len(raw)))
+    _record(path, "miss", len(raw), len(body), (time.process_time() - cpu_start) * 1000)
+    return Response(content=body, headers=headers)
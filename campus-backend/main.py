@@ -1,12 +1,19 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
 
 import models
 from config import settings
-from database import engine, get_db
+from database import (
+    engine, get_db, get_read_db, current_query_stats, new_query_stats, record_route_stats, get_route_stats,
+    current_request_routing, new_request_routing,
+)
+from queries import get_student_by_id
 from agent import run_agent
+from notifications import get_job_status, get_notification_queue
+from http_cache import FastJSONResponse, conditional_cache, get_http_stats
 from schemas import StudentCreate, StudentUpdate, ChatRequest
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -15,7 +22,18 @@ from fastapi.middleware.cors import CORSMiddleware
 print("DATABASE_URL =", settings.DATABASE_URL)
 models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Campus Admin Agent (Supabase)")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start notification workers now so jobs left unfinished by the last run
+    # (NOTIFY_BACKEND=sqlite) resume without waiting for a new job
+    get_notification_queue().start()
+    yield
+
+
+app = FastAPI(title="Campus Admin Agent (Supabase)", default_response_class=FastJSONResponse, lifespan=lifespan)
+# ETag/304 + compression for polled routes; added before CORS so 304s still get CORS headers
+app.middleware("http")(conditional_cache)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],  # Frontend origin
@@ -25,6 +43,24 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def db_latency(request: Request, call_next):
+    """Track DB time per route (Server-Timing + /metrics/db) and scope read-your-writes to the request."""
+    stats = new_query_stats()
+    token = current_query_stats.set(stats)
+    routing_token = current_request_routing.set(new_request_routing())
+    try:
+        response = await call_next(request)
+    finally:
+        current_query_stats.reset(token)
+        current_request_routing.reset(routing_token)
+    # Fixed label for 404s/scans, so unknown URLs don't each add a stats entry
+    route = getattr(request.scope.get("route"), "path", "<unmatched>")
+    record_route_stats(f"{request.method} {route}", stats)
+    response.headers["Server-Timing"] = f'db;dur={stats["db_ms"]:.2f};desc="{stats["queries"]} queries"'
+    return response
+
+
 # ============================
 #   STUDENT ROUTES (CRUD)
 # ============================
@@ -39,8 +75,8 @@ def create_student(payload: StudentCreate, db: Session = Depends(get_db)):
 
 
 @app.get("/students/{student_id}")
-def get_student(student_id: str, db: Session = Depends(get_db)):
-    student = db.query(models.Student).filter(models.Student.id == student_id).first()
+def get_student(student_id: str, db: Session = Depends(get_read_db)):
+    student = get_student_by_id(db, student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     return student
@@ -48,7 +84,7 @@ def get_student(student_id: str, db: Session = Depends(get_db)):
 
 @app.put("/students/{student_id}")
 def update_student_route(student_id: str, payload: StudentUpdate, db: Session = Depends(get_db)):
-    student = db.query(models.Student).filter(models.Student.id == student_id).first()
+    student = get_student_by_id(db, student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
@@ -62,7 +98,7 @@ def update_student_route(student_id: str, payload: StudentUpdate, db: Session =
 
 @app.delete("/students/{student_id}")
 def delete_student_route(student_id: str, db: Session = Depends(get_db)):
-    student = db.query(models.Student).filter(models.Student.id == student_id).first()
+    student = get_student_by_id(db, student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
@@ -72,7 +108,7 @@ def delete_student_route(student_id: str, db: Session = Depends(get_db)):
 
 
 @app.get("/students")
-def list_students_route(db: Session = Depends(get_db)):
+def list_students_route(db: Session = Depends(get_read_db)):
     """Return all students (no limit)."""
     students = db.query(models.Student).all()
     return {
@@ -94,18 +130,18 @@ def list_students_route(db: Session = Depends(get_db)):
 # ============================
 
 @app.get("/analytics/total")
-def total_students(db: Session = Depends(get_db)):
+def total_students(db: Session = Depends(get_read_db)):
     return {"total_students": db.query(models.Student).count()}
 
 
 @app.get("/analytics/recent")
-def recent_students(db: Session = Depends(get_db), limit: int = 5):
+def recent_students(db: Session = Depends(get_read_db), limit: int = 5):
     students = db.query(models.Student).order_by(models.Student.created_at.desc()).limit(limit).all()
     return {"recent_students": students}
 
 
 @app.get("/analytics/by-department")
-def students_by_department(db: Session = Depends(get_db)):
+def students_by_department(db: Session = Depends(get_read_db)):
     result = db.query(models.Student.department, 
                       models.func.count(models.Student.id))\
                .group_by(models.Student.department).all()
@@ -113,7 +149,7 @@ def students_by_department(db: Session = Depends(get_db)):
 
 
 @app.get("/analytics/active")
-def active_students(days: int = 7, db: Session = Depends(get_db)):
+def active_students(days: int = 7, db: Session = Depends(get_read_db)):
     since = datetime.utcnow() - timedelta(days=days)
     logs = db.query(models.ActivityLog).filter(models.ActivityLog.timestamp >= since).all()
     active = [
@@ -123,6 +159,34 @@ def active_students(days: int = 7, db: Session = Depends(get_db)):
     return {"active_students": active}
 
 
+# ============================
+#   NOTIFICATION ROUTES
+# ============================
+
+@app.get("/notifications/{job_id}")
+def notification_status(job_id: str):
+    status = get_job_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+
+# ============================
+#   METRICS
+# ============================
+
+@app.get("/metrics/db")
+def db_metrics():
+    """Per-route query count and DB latency since startup."""
+    return {"routes": get_route_stats()}
+
+
+@app.get("/metrics/http")
+def http_metrics():
+    """Per-route 304s, cache hits, bytes on the wire and CPU for polled routes."""
+    return {"routes": get_http_stats()}
+
+
 # ============================
 #   CHAT ROUTES
 # ============================
@@ -0,0 +1,339 @@
+# notifications.py
+"""
+Background notification queue.
+
+Tools and routes call `enqueue_email(...)` and get a job id back straight away;
+worker threads drain the queue, send in batches over pooled SMTP connections,
+retry transient failures and record per-job status in a job store
+(in-memory, or SQLite when NOTIFY_BACKEND=sqlite so jobs survive a restart).
+"""
+import json
+import queue
+import smtplib
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from email.message import EmailMessage
+
+from config import settings
+
+DEFAULT_SUBJECT = "Campus notification"
+FINISHED_STATUSES = ("sent", "partial", "failed")
+
+
+# ---------- Job Stores ----------
+class MemoryJobStore:
+    """Keeps jobs in a dict; lost on restart. Only the newest `max_finished` finished jobs are kept."""
+
+    def __init__(self, max_finished: int = 1000):
+        self._jobs = {}
+        self._finished = OrderedDict()  # finished job ids, oldest first
+        self.max_finished = max_finished
+        self._lock = threading.Lock()
+
+    def create(self, job: dict):
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields, updated_at=_now())
+            if fields.get("status") in FINISHED_STATUSES:
+                self._finished[job_id] = None
+                while len(self._finished) > self.max_finished:
+                    old_id, _ = self._finished.popitem(last=False)
+                    self._jobs.pop(old_id, None)
+
+    def pending_ids(self):
+        with self._lock:
+            return [j["id"] for j in self._jobs.values() if j["status"] in ("queued", "running")]
+
+
+class SQLiteJobStore:
+    """Durable job store; unfinished jobs are picked up again on startup."""
+
+    COLUMNS = ("id", "subject", "message", "recipients", "status", "progress",
+               "sent", "failed", "attempts", "error", "created_at", "updated_at")
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS notification_jobs (
+                    id TEXT PRIMARY KEY, subject TEXT, message TEXT, recipients TEXT,
+                    status TEXT, progress INTEGER, sent INTEGER, failed TEXT,
+                    attempts INTEGER, error TEXT, created_at TEXT, updated_at TEXT)"""
+            )
+
+    def create(self, job: dict):
+        row = _encode(job)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO notification_jobs ({', '.join(self.COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in self.COLUMNS)})",
+                [row[c] for c in self.COLUMNS],
+            )
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM notification_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return _decode(dict(zip(self.COLUMNS, row))) if row else None
+
+    def update(self, job_id: str, **fields):
+        fields = _encode(dict(fields, updated_at=_now()))
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE notification_jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                [*fields.values(), job_id],
+            )
+
+    def pending_ids(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM notification_jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [r[0] for r in rows]
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def _encode(job: dict) -> dict:
+    return {k: json.dumps(v) if k in ("recipients", "failed") else v for k, v in job.items()}
+
+
+def _decode(job: dict) -> dict:
+    return {k: json.loads(v) if k in ("recipients", "failed") else v for k, v in job.items()}
+
+
+# ---------- SMTP Connection Pool ----------
+class SMTPPool:
+    """Reuses logged-in SMTP connections across batches instead of reconnecting per email."""
+
+    def __init__(self, size: int):
+        self._idle = queue.LifoQueue()
+        self._size = size
+
+    def _connect(self) -> smtplib.SMTP:
+        conn = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=30)
+        if settings.SMTP_STARTTLS:
+            conn.starttls()
+        if settings.SMTP_USER:
+            conn.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        return conn
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            try:
+                if conn.noop()[0] == 250:
+                    return conn
+            except (smtplib.SMTPException, OSError):
+                pass
+            _close(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._checkout()
+        healthy = False
+        try:
+            yield conn
+            healthy = True
+        finally:
+            if healthy and self._idle.qsize() < self._size:
+                self._idle.put(conn)
+            else:
+                _close(conn)
+
+
+def _close(conn: smtplib.SMTP):
+    try:
+        conn.quit()
+    except (smtplib.SMTPException, OSError):
+        conn.close()
+
+
+# ---------- Queue + Workers ----------
+class NotificationQueue:
+    def __init__(self, store, workers: int, batch_size: int, max_retries: int, retry_delay: float = 1.0):
+        self.store = store
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay  # seconds before the first retry; doubles on each further retry
+        self._pool = SMTPPool(settings.SMTP_POOL_SIZE) if settings.SMTP_HOST else None
+        self._queue = queue.Queue()
+        self._workers = workers
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._started:
+                return
+            for job_id in self.store.pending_ids():
+                self._queue.put(job_id)
+            for i in range(self._workers):
+                threading.Thread(target=self._run, name=f"notify-worker-{i}", daemon=True).start()
+            self._started = True
+
+    def enqueue(self, recipients: list, message: str, subject: str = DEFAULT_SUBJECT) -> str:
+        """Store a job and hand it to the workers. `recipients` is a list of {"student_id", "email"}."""
+        self.start()  # before create(), so startup recovery doesn't queue this job twice
+        job_id = uuid.uuid4().hex
+        self.store.create({
+            "id": job_id, "subject": subject, "message": message, "recipients": recipients,
+            "status": "queued", "progress": 0, "sent": 0, "failed": [], "attempts": 0,
+            "error": None, "created_at": _now(), "updated_at": _now(),
+        })
+        self._queue.put(job_id)
+        return job_id
+
+    def status(self, job_id: str):
+        job = self.store.get(job_id)
+        if not job:
+            return None
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "total": len(job["recipients"]),
+            "sent": job["sent"],
+            "failed": job["failed"],
+            "attempts": job["attempts"],
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+        }
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._process(job_id)
+            except Exception as e:
+                self.store.update(job_id, status="failed", error=str(e))
+            finally:
+                self._queue.task_done()
+
+    def _process(self, job_id: str):
+        job = self.store.get(job_id)
+        if not job or job["status"] not in ("queued", "running"):
+            return
+        self.store.update(job_id, status="running")
+
+        recipients = job["recipients"]
+        progress, sent, failed = job["progress"], job["sent"], list(job["failed"])
+        attempts = job["attempts"]
+        retries = 0  # retries of the current batch; reset once a batch goes through
+
+        # `progress` is saved after every message, so a retry (or a restarted durable
+        # job) resumes with the first recipient that hasn't been sent to yet
+        while progress < len(recipients):
+            batch = recipients[progress:progress + self.batch_size]
+            try:
+                for recipient, delivered in self._send_batch(batch, job["subject"], job["message"]):
+                    if delivered:
+                        sent += 1
+                    else:
+                        failed.append(recipient["student_id"])
+                    progress += 1
+                    self.store.update(job_id, progress=progress, sent=sent, failed=failed)
+            except (smtplib.SMTPException, OSError) as e:
+                # Only transient errors get here (dropped connections, 4xx); 5xx are handled per message
+                attempts += 1
+                retries += 1
+                if retries > self.max_retries:
+                    failed.extend(r["student_id"] for r in recipients[progress:])
+                    self.store.update(job_id, status=_final_status(sent, failed), failed=failed,
+                                      attempts=attempts, error=str(e))
+                    return
+                self.store.update(job_id, attempts=attempts, error=str(e))
+                time.sleep(self.retry_delay * 2 ** (retries - 1))
+                continue
+
+            if retries:
+                retries = 0
+                self.store.update(job_id, error=None)
+
+        self.store.update(job_id, status=_final_status(sent, failed))
+
+    def _send_batch(self, batch: list, subject: str, message: str):
+        """Send one email per recipient over a single connection.
+
+        Yields (recipient, delivered) after each message, so the caller can record
+        progress before a later send in the batch fails.
+        """
+        if self._pool is None:
+            for r in batch:
+                print(f"[MOCK EMAIL] To {r['email']} | {message}")
+                yield r, True
+            return
+
+        with self._pool.connection() as conn:
+            for r in batch:
+                msg = EmailMessage()
+                msg["From"] = settings.SMTP_FROM
+                msg["To"] = r["email"]
+                msg["Subject"] = subject
+                msg.set_content(message)
+                try:
+                    conn.send_message(msg)
+                except smtplib.SMTPRecipientsRefused:
+                    yield r, False
+                except smtplib.SMTPResponseException as e:
+                    if e.smtp_code < 500:
+                        raise  # 4xx: transient, retried by _process
+                    yield r, False  # 5xx: permanent, but only for this message
+                else:
+                    yield r, True
+
+
+def _final_status(sent: int, failed: list) -> str:
+    if not failed:
+        return "sent"
+    return "partial" if sent else "failed"
+
+
+# ---------- Module-level queue ----------
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_notification_queue() -> NotificationQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            if settings.NOTIFY_BACKEND == "sqlite":
+                store = SQLiteJobStore(settings.NOTIFY_SQLITE_PATH)
+            else:
+                store = MemoryJobStore(max_finished=settings.NOTIFY_MEMORY_MAX_FINISHED)
+            _queue = NotificationQueue(
+                store,
+                workers=settings.NOTIFY_WORKERS,
+                batch_size=settings.NOTIFY_BATCH_SIZE,
+                max_retries=settings.NOTIFY_MAX_RETRIES,
+            )
+        return _queue
+
+
+def enqueue_email(recipients: list, message: str, subject: str = DEFAULT_SUBJECT) -> str:
+    return get_notification_queue().enqueue(recipients, message, subject)
+
+
+def get_job_status(job_id: str):
+    return get_notification_queue().status(job_id)
@@ -0,0 +1,25 @@
+# queries.py
+"""
+Hot lookup queries, written as lambda statements so SQLAlchemy builds and
+compiles each one once and then reuses it from the compiled-statement cache.
+"""
+from sqlalchemy import lambda_stmt, select
+from sqlalchemy.orm import Session
+from models import Student
+
+
+def get_student_by_id(db: Session, student_id: str):
+    stmt = lambda_stmt(lambda: select(Student).where(Student.id == student_id))
+    return db.execute(stmt).scalars().first()
+
+
+def get_emails_by_ids(db: Session, student_ids: list):
+    stmt = lambda_stmt(lambda: select(Student.id, Student.email)
+                       .where(Student.id.in_(student_ids), Student.email.isnot(None)))
+    return db.execute(stmt).all()
+
+
+def get_emails_by_department(db: Session, department: str):
+    stmt = lambda_stmt(lambda: select(Student.id, Student.email)
+                       .where(Student.department == department, Student.email.isnot(None)))
+    return db.execute(stmt).all()
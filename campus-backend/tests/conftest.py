@@ -0,0 +1,21 @@
+# tests/conftest.py
+import os
+import tempfile
+
+import pytest
+
+# config.py / database.py read these at import time: a writer and a separate
+# "replica" SQLite file (nothing replicates between them, which makes routing visible)
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("SUPABASE_URL", f"sqlite:///{_tmp}/writer.db")
+os.environ.setdefault("DATABASE_READ_URLS", f"sqlite:///{_tmp}/replica.db")
+
+
+@pytest.fixture
+def tables():
+    import database
+    import models
+
+    for eng in {database.engine, *database.read_engines}:
+        models.Base.metadata.drop_all(bind=eng)
+        models.Base.metadata.create_all(bind=eng)
@@ -0,0 +1,90 @@
+# tests/test_database.py
+"""Replica routing and read-your-writes, with two unreplicated SQLite files as writer and replica."""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import database
+import models
+from database import (
+    ReadSessionLocal, SessionLocal, current_query_stats, current_request_routing,
+    new_query_stats, new_request_routing,
+)
+from queries import get_student_by_id
+
+
+pytestmark = pytest.mark.usefixtures("tables")
+
+
+@pytest.fixture
+def request_scope():
+    """Stand-in for the per-request middleware in main.py."""
+    routing, stats = new_request_routing(), new_query_stats()
+    tokens = current_request_routing.set(routing), current_query_stats.set(stats)
+    yield routing, stats
+    current_request_routing.reset(tokens[0])
+    current_query_stats.reset(tokens[1])
+
+
+def _add_student(student_id: str):
+    db = SessionLocal()
+    try:
+        db.add(models.Student(id=student_id, name="Test"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _read_student(student_id: str):
+    db = ReadSessionLocal()
+    try:
+        return get_student_by_id(db, student_id)
+    finally:
+        db.close()
+
+
+def test_reads_go_to_replica(request_scope):
+    routing, stats = request_scope
+    _add_student("s1")
+
+    # New request: the replica hasn't got the row (nothing replicates in this setup)
+    routing.update(new_request_routing())
+    assert _read_student("s1") is None
+    assert routing["used_replica"]
+    assert stats["reader"] == 1
+
+
+def test_write_in_request_sends_later_sessions_to_writer(request_scope):
+    routing, _ = request_scope
+    _add_student("s1")
+
+    assert routing["use_writer"]
+    assert _read_student("s1") is not None
+    assert not routing["used_replica"]
+
+
+def test_session_sticks_to_writer_after_flush():
+    db = ReadSessionLocal()
+    try:
+        assert db.get_bind() is not database.engine
+        db.add(models.Student(id="s2", name="Test"))
+        db.flush()
+        assert db.get_bind() is database.engine
+        assert get_student_by_id(db, "s2") is not None
+    finally:
+        db.close()
+
+
+def test_failed_statement_leaves_no_timing_state(request_scope):
+    _, stats = request_scope
+    with database.engine.connect() as conn:
+        info_before = dict(conn.info)
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM no_such_table"))
+        # Nothing from the failed statement lingers on the pooled connection, and it isn't counted
+        assert conn.info == info_before
+        assert stats["queries"] == 0
+
+        conn.execute(text("SELECT 1"))
+    assert stats["queries"] == 1
+    assert stats["db_ms"] > 0
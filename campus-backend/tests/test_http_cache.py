@@ -0,0 +1,154 @@
+# tests/test_http_cache.py
+"""ETag/304, body caching and replica safety of the conditional_cache middleware."""
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import database
+import http_cache
+from config import settings
+from database import current_request_routing, get_db, get_read_db
+from models import Student
+
+
+def _make_app():
+    app = FastAPI(default_response_class=http_cache.FastJSONResponse)
+    app.middleware("http")(http_cache.conditional_cache)
+
+    @app.post("/students/{student_id}")
+    def add(student_id: str, db: Session = Depends(get_db)):
+        db.add(Student(id=student_id, name="Test"))
+        db.commit()
+        return {"status": "success"}
+
+    @app.get("/students")
+    def list_students(db: Session = Depends(get_read_db)):
+        return {"students": [s.id for s in db.query(Student).all()]}
+
+    @app.get("/replica-students")
+    def replica_students():
+        # Bypasses RoutingSession on purpose, like a route that reads a replica directly
+        current_request_routing.get()["used_replica"] = True
+        with database.read_engines[0].connect() as conn:
+            return {"students": [row[0] for row in conn.execute(text("SELECT id FROM students"))]}
+
+    @app.get("/analytics/active")
+    def active(db: Session = Depends(get_read_db)):
+        return {"active_students": []}
+
+    return app
+
+
+@pytest.fixture
+def client(tables, monkeypatch):
+    http_cache._body_cache.clear()
+    monkeypatch.setitem(http_cache.CACHED_ROUTES, "/replica-students", ("students",))
+    return TestClient(_make_app())
+
+
+def test_304_when_etag_matches(client):
+    first = client.get("/students")
+    etag = first.headers["etag"]
+
+    second = client.get("/students", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+
+
+def test_write_changes_etag(client):
+    etag = client.get("/students").headers["etag"]
+    client.post("/students/s1")
+
+    response = client.get("/students", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_revalidation_after_write_gets_fresh_body(client):
+    # The replica never receives the row here, so a replica read would return []
+    client.post("/students/s1")
+
+    response = client.get("/students")
+    assert response.json() == {"students": ["s1"]}
+
+    revalidated = client.get("/students", headers={"If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert any(key[0] == response.headers["etag"] for key in http_cache._body_cache)
+
+
+def test_cache_misses_read_from_writer_without_recent_writes(client):
+    # Fresh process state: no version bumps yet, and the body cache still fills
+    response = client.get("/students")
+    assert response.status_code == 200
+    assert http_cache._body_cache
+
+
+def test_replica_read_gets_no_etag(client):
+    client.post("/students/s1")
+
+    response = client.get("/replica-students")
+    assert response.json() == {"students": []}
+    assert "etag" not in response.headers
+    assert response.headers["cache-control"] == "no-store"
+    assert not http_cache._body_cache
+
+
+def test_etag_includes_process_nonce(monkeypatch):
+    etag = http_cache._etag("/students", "", ("students",))
+    monkeypatch.setattr(http_cache, "_PROCESS_NONCE", "restarted")
+    assert http_cache._etag("/students", "", ("students",)) != etag
+
+
+def test_time_bucketed_route_etag_changes_with_clock(client, monkeypatch):
+    monkeypatch.setattr(http_cache, "_time_bucket", lambda seconds: 1)
+    etag = client.get("/analytics/active").headers["etag"]
+    assert client.get("/analytics/active", headers={"If-None-Match": etag}).status_code == 304
+
+    monkeypatch.setattr(http_cache, "_time_bucket", lambda seconds: 2)
+    response = client.get("/analytics/active", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip", "gzip"),
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("gzip;q=0, identity", None),
+    ("gzip;q=0", None),
+    ("br;q=0, gzip;q=0.8", "gzip"),
+    ("*", "br"),
+    ("*;q=0", None),
+    ("gzip;q=0.5, identity", None),
+    ("", None),
+])
+def test_choose_encoding_respects_q_values(accept_encoding, expected):
+    assert http_cache._choose_encoding(accept_encoding) == expected
+
+
+def test_compresses_only_above_threshold(client, monkeypatch):
+    for i in range(20):
+        client.post(f"/students/student-{i:03d}")
+
+    monkeypatch.setattr(settings, "HTTP_COMPRESS_MIN_BYTES", 10_000)
+    small = client.get("/students", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+    monkeypatch.setattr(settings, "HTTP_COMPRESS_MIN_BYTES", 100)
+    http_cache._body_cache.clear()
+    large = client.get("/students", headers={"Accept-Encoding": "gzip"})
+    assert large.headers["content-encoding"] == "gzip"
+    assert large.json() == small.json()
+    assert int(large.headers["content-length"]) < len(small.content)
+
+
+def test_brotli_when_preferred(client, monkeypatch):
+    pytest.importorskip("brotli")
+    monkeypatch.setattr(settings, "HTTP_COMPRESS_MIN_BYTES", 10)
+    client.post("/students/s1")
+
+    response = client.get("/students", headers={"Accept-Encoding": "gzip;q=0.5, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.json() == {"students": ["s1"]}
@@ -0,0 +1,81 @@
+# tests/test_main.py
+"""The real main.app middleware stack (db_latency -> CORS -> conditional_cache -> routes)."""
+import sys
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+
+import database
+
+pytestmark = pytest.mark.usefixtures("tables")
+
+
+@pytest.fixture(scope="module")
+def app():
+    # The chat agent (LLM client, FAISS index) isn't under test here
+    sys.modules.setdefault("agent", types.SimpleNamespace(run_agent=None))
+    import main
+    return main.app
+
+
+@pytest.fixture
+def client(app):
+    with TestClient(app) as c:
+        yield c
+
+
+def test_unmatched_paths_share_one_stats_entry(client):
+    client.get("/no/such/path")
+    client.get("/wp-login.php")
+
+    routes = client.get("/metrics/db").json()["routes"]
+    assert routes["GET <unmatched>"]["requests"] == 2
+    assert not any("wp-login" in route or "/no/such" in route for route in routes)
+
+
+def test_route_stats_use_route_template(client):
+    client.get("/students/s1")
+    client.get("/students/s2")
+
+    assert database.get_route_stats()["GET /students/{student_id}"]["requests"] >= 2
+
+
+ORIGIN = {"Origin": "http://localhost:3000"}
+
+
+@pytest.fixture
+def students(tables, client, monkeypatch):
+    import http_cache
+    from config import settings
+
+    http_cache._body_cache.clear()
+    monkeypatch.setattr(settings, "HTTP_COMPRESS_MIN_BYTES", 100)
+    for i in range(10):
+        response = client.post("/students", json={"id": f"s{i}", "name": f"Student {i}",
+                                                  "department": "CS", "email": f"s{i}@campus.edu"})
+        assert response.status_code == 200
+
+
+@pytest.mark.usefixtures("students")
+def test_polled_route_through_full_stack(client):
+    first = client.get("/students", headers={**ORIGIN, "Accept-Encoding": "gzip"})
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+    assert len(first.json()["students"]) == 10
+    assert first.headers["access-control-allow-origin"] == "http://localhost:3000"
+    assert "server-timing" in first.headers  # db_latency sits outside conditional_cache
+
+    # 304s are still wrapped by CORS and never reach the database
+    second = client.get("/students", headers={**ORIGIN, "If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304
+    assert second.headers["access-control-allow-origin"] == "http://localhost:3000"
+    assert second.headers["server-timing"].startswith("db;dur=0.00")
+
+
+@pytest.mark.usefixtures("students")
+def test_refused_encoding_is_not_used(client):
+    response = client.get("/students", headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert len(response.json()["students"]) == 10
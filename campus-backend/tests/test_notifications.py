@@ -0,0 +1,198 @@
+# tests/test_notifications.py
+"""Notification queue against a local aiosmtpd server: batching, retry/resume and status."""
+import smtplib
+import socket
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from config import settings
+from notifications import MemoryJobStore, NotificationQueue, SQLiteJobStore, SMTPPool
+
+
+class RecordingHandler:
+    """Accepts mail, refuses addresses starting with "bad", and can fail chosen messages with 421 or 550."""
+
+    def __init__(self):
+        self.delivered = []
+        self.fail_on = set()  # 1-based DATA commands to answer with 421 (closes the connection)
+        self.reject_on = set()  # 1-based DATA commands to answer with a permanent 550
+        self.data_count = 0
+        self.sessions = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bad"):
+            return "550 no such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.data_count += 1
+        if self.data_count in self.fail_on:
+            return "421 service not available"
+        if self.data_count in self.reject_on:
+            return "550 message rejected"
+        self.delivered.extend(envelope.rcpt_tos)
+        return "250 OK"
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    handler = RecordingHandler()
+    port = _free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(settings, "SMTP_PORT", port)
+    monkeypatch.setattr(settings, "SMTP_STARTTLS", False)
+    monkeypatch.setattr(settings, "SMTP_USER", None)
+    yield handler
+    controller.stop()
+
+
+def _recipients(*emails):
+    return [{"student_id": f"s-{e}", "email": f"{e}@campus.test"} for e in emails]
+
+
+def _run(q, recipients, message="hello"):
+    job_id = q.enqueue(recipients, message)
+    q._queue.join()
+    return q.status(job_id)
+
+
+def test_batches_over_pooled_connections(smtp_server):
+    q = NotificationQueue(MemoryJobStore(), workers=1, batch_size=3, max_retries=0, retry_delay=0)
+    status = _run(q, _recipients(*[f"e{i}" for i in range(7)]))
+
+    assert status["status"] == "sent"
+    assert status["sent"] == 7
+    assert smtp_server.delivered == [f"e{i}@campus.test" for i in range(7)]
+    assert smtp_server.sessions == 1  # three batches, one pooled connection
+
+
+def test_refused_recipient_marks_job_partial(smtp_server):
+    q = NotificationQueue(MemoryJobStore(), workers=1, batch_size=3, max_retries=0, retry_delay=0)
+    status = _run(q, _recipients("e0", "bad1", "e2"))
+
+    assert status["status"] == "partial"
+    assert status["sent"] == 2
+    assert status["failed"] == ["s-bad1"]
+
+
+def test_retry_resumes_mid_batch_without_duplicates(smtp_server):
+    smtp_server.fail_on = {3}
+    q = NotificationQueue(MemoryJobStore(), workers=1, batch_size=3, max_retries=2, retry_delay=0)
+    status = _run(q, _recipients(*[f"e{i}" for i in range(5)]))
+
+    assert smtp_server.delivered == [f"e{i}@campus.test" for i in range(5)]
+    assert status["status"] == "sent"
+    assert status["attempts"] == 1
+    assert status["error"] is None
+
+
+def test_permanent_rejection_fails_only_that_recipient(smtp_server):
+    smtp_server.reject_on = {2}
+    q = NotificationQueue(MemoryJobStore(), workers=1, batch_size=3, max_retries=0, retry_delay=0)
+    status = _run(q, _recipients(*[f"e{i}" for i in range(5)]))
+
+    assert smtp_server.delivered == [f"e{i}@campus.test" for i in (0, 2, 3, 4)]
+    assert status["status"] == "partial"
+    assert status["failed"] == ["s-e1"]
+    assert status["attempts"] == 0
+
+
+def test_retries_are_counted_per_batch(smtp_server):
+    # One transient failure in each of three batches; max_retries=1 must not fail the job
+    smtp_server.fail_on = {1, 4, 7}
+    q = NotificationQueue(MemoryJobStore(), workers=1, batch_size=2, max_retries=1, retry_delay=0)
+    status = _run(q, _recipients(*[f"e{i}" for i in range(6)]))
+
+    assert status["status"] == "sent"
+    assert status["sent"] == 6
+    assert status["attempts"] == 3
+    assert len(smtp_server.delivered) == 6
+
+
+def test_gives_up_after_max_retries(smtp_server):
+    smtp_server.fail_on = {2, 3, 4}
+    q = NotificationQueue(MemoryJobStore(), workers=1, batch_size=5, max_retries=2, retry_delay=0)
+    status = _run(q, _recipients("e0", "e1", "e2"))
+
+    assert status["status"] == "partial"
+    assert status["sent"] == 1
+    assert status["failed"] == ["s-e1", "s-e2"]
+    assert status["error"]
+
+
+def test_sqlite_job_resumes_on_start(smtp_server, tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    recipients = _recipients("e0", "e1", "e2", "e3")
+    # A job the previous process left half done
+    store.create({
+        "id": "job-1", "subject": "s", "message": "m", "recipients": recipients,
+        "status": "running", "progress": 2, "sent": 2, "failed": [], "attempts": 0,
+        "error": None, "created_at": "2026-01-01T00:00:00", "updated_at": "2026-01-01T00:00:00",
+    })
+
+    q = NotificationQueue(store, workers=1, batch_size=3, max_retries=0, retry_delay=0)
+    q.start()
+    q._queue.join()
+
+    assert smtp_server.delivered == ["e2@campus.test", "e3@campus.test"]
+    assert q.status("job-1")["status"] == "sent"
+    assert q.status("job-1")["sent"] == 4
+
+
+def test_pool_replaces_connection_that_died_idle(monkeypatch):
+    class DeadConnection:
+        closed = False
+
+        def noop(self):
+            raise OSError("connection reset")
+
+        def quit(self):
+            raise smtplib.SMTPServerDisconnected()
+
+        def close(self):
+            self.closed = True
+
+    dead, fresh = DeadConnection(), object()
+    pool = SMTPPool(size=1)
+    pool._idle.put(dead)
+    monkeypatch.setattr(pool, "_connect", lambda: fresh)
+
+    assert pool._checkout() is fresh
+    assert dead.closed
+
+
+def test_mock_mode_without_smtp_host(monkeypatch, capsys):
+    monkeypatch.setattr(settings, "SMTP_HOST", None)
+    q = NotificationQueue(MemoryJobStore(), workers=1, batch_size=2, max_retries=0, retry_delay=0)
+    status = _run(q, _recipients("e0", "e1", "e2"))
+
+    assert status["status"] == "sent"
+    assert "[MOCK EMAIL] To e2@campus.test" in capsys.readouterr().out
+
+
+def test_memory_store_evicts_oldest_finished_jobs():
+    store = MemoryJobStore(max_finished=2)
+    for job_id in ("a", "b", "c", "d"):
+        store.create({"id": job_id, "status": "queued"})
+    for job_id in ("a", "b", "c"):
+        store.update(job_id, status="sent")
+
+    assert store.get("a") is None
+    assert store.get("b")["status"] == "sent"
+    assert store.get("c")["status"] == "sent"
+    assert store.get("d")["status"] == "queued"  # unfinished jobs are never evicted
@@ -1,9 +1,11 @@
 from agents import function_tool
-from database import SessionLocal
+from database import SessionLocal, ReadSessionLocal
 from models import Student, ActivityLog
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
+from notifications import enqueue_email, get_job_status
+from queries import get_student_by_id, get_emails_by_ids, get_emails_by_department
 
 # --- Import FAISS + Embeddings for RAG ---
 from langchain_community.vectorstores import FAISS
@@ -73,9 +75,9 @@ def add_student(id: str, name: str, department: str = None, email: str = None) -
 @function_tool
 def get_student(id: str) -> dict:
     """Fetch student by ID"""
-    db = SessionLocal()
+    db = ReadSessionLocal()
     try:
-        student = db.query(Student).filter(Student.id == id).first()
+        student = get_student_by_id(db, id)
         if not student:
             return {"status": "error", "message": "Student not found"}
         return {
@@ -93,7 +95,7 @@ def update_student(id: str, field: str, value: str) -> dict:
     """Update a student field"""
     db = SessionLocal()
     try:
-        student = db.query(Student).filter(Student.id == id).first()
+        student = get_student_by_id(db, id)
         if not student:
             return {"status": "error", "message": "Student not found"}
         setattr(student, field, value)
@@ -117,7 +119,7 @@ def delete_student(id: str) -> dict:
     """Delete student by ID"""
     db = SessionLocal()
     try:
-        student = db.query(Student).filter(Student.id == id).first()
+        student = get_student_by_id(db, id)
         if not student:
             return {"status": "error", "message": "Student not found"}
         db.delete(student)
@@ -130,7 +132,7 @@ def delete_student(id: str) -> dict:
 @function_tool
 def list_students(limit: int = 10) -> dict:
     """List students"""
-    db = SessionLocal()
+    db = ReadSessionLocal()
     try:
         students = db.query(Student).limit(limit).all()
         return {
@@ -147,7 +149,7 @@ def list_students(limit: int = 10) -> dict:
 @function_tool
 def get_total_students() -> dict:
     """Get total student count"""
-    db = SessionLocal()
+    db = ReadSessionLocal()
     try:
         count = db.query(Student).count()
         return {"total_students": count}
@@ -158,7 +160,7 @@ def get_total_students() -> dict:
 @function_tool
 def get_students_by_department() -> dict:
     """Get student count grouped by department"""
-    db = SessionLocal()
+    db = ReadSessionLocal()
     try:
         result = db.query(Student.department, func.count(Student.id)).group_by(Student.department).all()
         return {
@@ -171,7 +173,7 @@ def get_students_by_department() -> dict:
 @function_tool
 def get_last_added_students(limit: int = 5) -> dict:
     """Get the last N onboarded students"""
-    db = SessionLocal()
+    db = ReadSessionLocal()
     try:
         students = db.query(Student).order_by(Student.created_at.desc()).limit(limit).all()
         return {
@@ -187,7 +189,7 @@ def get_last_added_students(limit: int = 5) -> dict:
 @function_tool
 def get_active_students(days: int = 7) -> dict:
     """Get students active in the last N days"""
-    db = SessionLocal()
+    db = ReadSessionLocal()
     try:
         since = datetime.utcnow() - timedelta(days=days)
         logs = db.query(ActivityLog).filter(ActivityLog.timestamp >= since).all()
@@ -202,16 +204,60 @@ def get_active_students(days: int = 7) -> dict:
 
 
 # ---------- NOTIFICATION ----------
+# Sends run on the background queue in notifications.py; tools only resolve
+# recipients and return a job id, so the agent turn never waits on SMTP.
 @function_tool
 def send_email(student_id: str, message: str) -> dict:
-    """Mock sending email to a student (replace with real SMTP later)"""
-    db = SessionLocal()
+    """Queue an email to a student. Returns a job id to check with get_notification_status."""
+    db = ReadSessionLocal()
     try:
-        student = db.query(Student).filter(Student.id == student_id).first()
+        student = get_student_by_id(db, student_id)
         if not student or not student.email:
             return {"status": "error", "message": "No email found"}
-        print(f"[MOCK EMAIL] To {student.email} | {message}")
-        return {"status": "sent", "to": student.email, "message": message}
+        job_id = enqueue_email([{"student_id": student.id, "email": student.email}], message)
+        return {"status": "queued", "job_id": job_id, "to": student.email}
     finally:
         db.close()
 
+
+@function_tool
+def send_to_department(department: str, message: str) -> dict:
+    """Queue an email to every student in a department. Returns a job id."""
+    db = ReadSessionLocal()
+    try:
+        rows = get_emails_by_department(db, department)
+        if not rows:
+            return {"status": "error", "message": f"No students with email in {department}"}
+        job_id = enqueue_email([{"student_id": r.id, "email": r.email} for r in rows], message)
+        return {"status": "queued", "job_id": job_id, "recipients": len(rows)}
+    finally:
+        db.close()
+
+
+@function_tool
+def send_to_many(student_ids: list[str], message: str) -> dict:
+    """Queue an email to a list of students. Returns a job id."""
+    db = ReadSessionLocal()
+    try:
+        rows = get_emails_by_ids(db, student_ids)
+        if not rows:
+            return {"status": "error", "message": "No emails found"}
+        found = {r.id for r in rows}
+        job_id = enqueue_email([{"student_id": r.id, "email": r.email} for r in rows], message)
+        return {
+            "status": "queued",
+            "job_id": job_id,
+            "recipients": len(rows),
+            "skipped": [sid for sid in student_ids if sid not in found],
+        }
+    finally:
+        db.close()
+
+
+@function_tool
+def get_notification_status(job_id: str) -> dict:
+    """Get the delivery status of a queued notification job"""
+    status = get_job_status(job_id)
+    if not status:
+        return {"status": "error", "message": "Job not found"}
+    return status